@@ -8,11 +8,10 @@ __revision__ = "$Format:%H$"
 
 from pathlib import Path
 
+from qgis.PyQt.QtCore import QTimer
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction
 
-from .dialog import OSMConflatorDialog
-
 
 class OSMConflatorPlugin:
     """The osm-conflator QGIS plugin."""
@@ -21,15 +20,23 @@ class OSMConflatorPlugin:
         """Initialise plugin."""
         self.iface = iface
         self.plugin_dir = Path(__file__).parent
+        self._icon_path = str(self.plugin_dir / "icon.svg")
 
     def initGui(self):
-        """Load GUI elements."""
-        icon_path = str(self.plugin_dir / "icon.svg")
-        self.action = QAction(
-            QIcon(icon_path), "OSM Conflator", self.iface.mainWindow()
-        )
+        """Load GUI elements.
+
+        QGIS runs every installed plugin's initGui at startup, so anything
+        deferrable is: the SVG icon is set on the next event-loop pass and
+        the dialog module is imported on first use in :meth:`run`.
+        """
+        self.action = QAction("OSM Conflator", self.iface.mainWindow())
         self.iface.addToolBarIcon(self.action)
         self.action.triggered.connect(self.run)
+        QTimer.singleShot(0, self._load_icon)
+
+    def _load_icon(self):
+        """Load the toolbar icon after startup has finished."""
+        self.action.setIcon(QIcon(self._icon_path))
 
     def unload(self):
         """Unload GUI elements."""
@@ -38,5 +45,9 @@ class OSMConflatorPlugin:
 
     def run(self):
         """Run the main processing dialog."""
+        # Imported lazily so the dialog module and its transitive imports
+        # (HTTP client, GDAL bindings) don't load at QGIS startup.
+        from .dialog import OSMConflatorDialog
+
         dlg = OSMConflatorDialog(self.iface, self.iface.mainWindow())
         dlg.exec_()
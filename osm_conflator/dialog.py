@@ -1,12 +1,21 @@
 """Primary dialog for Postpass-based OSM data extraction."""
 
-import json
-import tempfile
+import re
+import uuid
 from typing import Optional
 
-from qgis.core import Qgis, QgsMessageLog, QgsProject, QgsVectorLayer
+from osgeo import gdal
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsMessageLog,
+    QgsProject,
+    QgsTask,
+    QgsVectorLayer,
+)
 from qgis.PyQt.QtCore import Qt
 from qgis.PyQt.QtWidgets import (
+    QCheckBox,
     QComboBox,
     QDialog,
     QFormLayout,
@@ -17,9 +26,76 @@ from qgis.PyQt.QtWidgets import (
     QVBoxLayout,
 )
 
-from .postpass.client import PostpassClient, PostpassClientError
+from .postpass.client import (
+    PostpassCancelledError,
+    PostpassClient,
+    PostpassClientError,
+)
 from .postpass.query_builder import build_simple_query
 
+_EMPTY_FEATURE_COLLECTION = b'{"type": "FeatureCollection", "features": []}'
+
+# Compiled once: splits bbox input on commas, semicolons or whitespace and
+# swallows surrounding spaces, so no per-part strip() is needed.
+_BBOX_SEP = re.compile(r"[,;\s]+")
+
+
+class _VsimemFile:
+    """Minimal writable file object backed by GDAL's /vsimem/ filesystem."""
+
+    def __init__(self, path: str):
+        """Open ``path`` for binary writing in the in-memory filesystem."""
+        self._fh = gdal.VSIFOpenL(path, "wb")
+        if self._fh is None:
+            raise OSError(f"Could not open {path} for writing.")
+
+    def write(self, data: bytes) -> None:
+        """Append ``data`` to the in-memory file."""
+        gdal.VSIFWriteL(data, 1, len(data), self._fh)
+
+    def close(self) -> None:
+        """Close the underlying VSI handle."""
+        gdal.VSIFCloseL(self._fh)
+
+
+class PostpassQueryTask(QgsTask):
+    """Background task running a Postpass query off the GUI thread."""
+
+    def __init__(self, client: PostpassClient, sql: str, path: str, on_done):
+        """Store the query inputs and the main-thread completion callback."""
+        super().__init__("Postpass query", QgsTask.CanCancel)
+        self._client = client
+        self._sql = sql
+        self._path = path
+        self._on_done = on_done
+        self.error: Optional[str] = None
+        self.cancelled = False
+
+    def run(self) -> bool:
+        """Execute the HTTP request and stream the response into /vsimem/."""
+        try:
+            fh = _VsimemFile(self._path)
+            try:
+                self._client.run_sql_to_fileobj(
+                    self._sql, fh, cancel_check=self.isCanceled
+                )
+            finally:
+                fh.close()
+        except OSError as exc:
+            self.error = str(exc)
+            return False
+        except PostpassCancelledError:
+            self.cancelled = True
+            return False
+        except (ValueError, PostpassClientError) as exc:
+            self.error = str(exc)
+            return False
+        return True
+
+    def finished(self, result: bool) -> None:
+        """Report back to the dialog; runs on the main thread."""
+        self._on_done(result, self)
+
 
 class OSMConflatorDialog(QDialog):
     """Dialog to construct a simple Postpass query and load results."""
@@ -58,7 +134,12 @@ class OSMConflatorDialog(QDialog):
         self.tagKeyEdit = QLineEdit()
         self.tagKeyEdit.setPlaceholderText("e.g. amenity")
         self.tagValueEdit = QLineEdit()
-        self.tagValueEdit.setPlaceholderText("e.g. fast_food")
+        self.tagValueEdit.setPlaceholderText("e.g. fast_food or bar,cafe,pub")
+
+        # Return ST_Centroid(geom) instead of full geometries: for building
+        # polygons the response shrinks 10-100x, so transfer-bound queries
+        # get proportionally faster.
+        self.centroidCheck = QCheckBox("Use centroid (faster, smaller)")
 
         # Layer name
         self.layerNameEdit = QLineEdit()
@@ -87,6 +168,7 @@ class OSMConflatorDialog(QDialog):
         tag_row.addWidget(self.tagValueEdit)
         form.addRow("Tag filter (key / value):", tag_row)
 
+        form.addRow("Geometry output:", self.centroidCheck)
         form.addRow("Layer name:", self.layerNameEdit)
 
         layout = QVBoxLayout()
@@ -98,6 +180,19 @@ class OSMConflatorDialog(QDialog):
         # Connections
         self.runButton.clicked.connect(self._on_run_clicked)
 
+        # Background query state
+        self._task: Optional[PostpassQueryTask] = None
+        self._pending_path: Optional[str] = None
+        self._pending_layer_name: Optional[str] = None
+
+        # Shared HTTP client for the dialog session (keep-alive + cache).
+        self._client: Optional[PostpassClient] = None
+        self.finished.connect(self._on_dialog_finished)
+
+        # /vsimem/ files owned by loaded layers, keyed by layer id.
+        self._vsimem_paths: dict[str, str] = {}
+        QgsProject.instance().layerWillBeRemoved.connect(self._on_layer_removed)
+
     # ------------------------------------------------------------------
     # Helpers
     # ------------------------------------------------------------------
@@ -110,10 +205,11 @@ class OSMConflatorDialog(QDialog):
                 "min_lon,min_lat,max_lon,max_lat."
             )
             return None
-        parts = [p.strip() for p in text.split(",")]
+        parts = _BBOX_SEP.split(text)
         if len(parts) != 4:
             self._set_error(
-                "Bounding box must have exactly four comma-separated values."
+                "Bounding box must have exactly four values, separated by "
+                "commas, semicolons or spaces."
             )
             return None
         try:
@@ -121,8 +217,16 @@ class OSMConflatorDialog(QDialog):
         except ValueError:
             self._set_error("Bounding box values must be numeric.")
             return None
-        if min_lon >= max_lon or min_lat >= max_lat:
-            self._set_error("Bounding box min values must be less than max values.")
+        # One chained comparison checks ordering and WGS84 range together;
+        # Postpass rejects out-of-range boxes anyway, so fail them locally
+        # instead of paying an HTTP round-trip for the error.
+        if not (
+            -180.0 <= min_lon < max_lon <= 180.0 and -90.0 <= min_lat < max_lat <= 90.0
+        ):
+            self._set_error(
+                "Bounding box must be within WGS84 bounds with min values "
+                "less than max values."
+            )
             return None
         return min_lon, min_lat, max_lon, max_lat
 
@@ -150,57 +254,129 @@ class OSMConflatorDialog(QDialog):
 
         table_name = self.geomCombo.currentData()
         tag_key = self.tagKeyEdit.text().strip() or None
-        tag_value = self.tagValueEdit.text().strip() or None
+        # Comma-separated values route through the builder's IN (...) branch,
+        # so several types cost one HTTP round-trip instead of N.
+        tag_values = [
+            v.strip() for v in self.tagValueEdit.text().split(",") if v.strip()
+        ]
 
         endpoint = self.endpointEdit.text().strip()
         if not endpoint:
             self._set_error("Please enter a Postpass endpoint URL.")
             return
-        client = PostpassClient(endpoint=endpoint)
-        try:
-            # MVP default: buildings extraction when no explicit tag filter is provided.
-            if not tag_key:
-                geojson = client.extract_buildings(bbox)
-                tag_key = "building"
-                tag_value = "yes"
-                table_name = "postpass_pointpolygon"
-            else:
-                sql = build_simple_query(
-                    table=table_name,
-                    bbox=bbox,
-                    columns=[],  # keep default osm_id, tags, geom
-                    tag_key=tag_key,
-                    tag_values=[tag_value] if tag_value else [],
-                )
-                geojson = client.run_sql(sql)
-        except (ValueError, PostpassClientError) as exc:
-            self._set_error(str(exc))
-            return
+        # MVP default: buildings extraction when no explicit tag filter is provided.
+        if not tag_key:
+            tag_key = "building"
+            tag_values = ["yes"]
+            table_name = "postpass_pointpolygon"
+
+        # Back the GeoJSON with GDAL's in-memory filesystem rather than a
+        # disk tempfile: the OGR provider reads /vsimem/ paths directly, so
+        # the response never touches disk.
+        geojson_path = f"/vsimem/osm_conflator_postpass_{uuid.uuid4().hex}.geojson"
 
         try:
-            tmp = tempfile.NamedTemporaryFile(
-                suffix=".geojson", prefix="osm_conflator_postpass_", delete=False
+            sql = build_simple_query(
+                table=table_name,
+                bbox=bbox,
+                columns=[],  # keep default osm_id, tags, geom
+                tag_key=tag_key,
+                tag_values=tag_values,
+                use_centroid=self.centroidCheck.isChecked(),
             )
-            with tmp:
-                tmp.write(json.dumps(geojson).encode("utf-8"))
-            geojson_path = tmp.name
-        except Exception as exc:  # noqa: BLE001
-            self._set_error(f"Failed to write temporary GeoJSON file: {exc}")
+        except ValueError as exc:
+            self._set_error(str(exc))
             return
 
         layer_name = self.layerNameEdit.text().strip()
         if not layer_name:
-            if tag_key and tag_value:
-                layer_name = f"{table_name} {tag_key}={tag_value}"
+            if tag_key and tag_values:
+                layer_name = f"{table_name} {tag_key}={','.join(tag_values)}"
             elif tag_key:
                 layer_name = f"{table_name} {tag_key}"
             else:
                 layer_name = table_name
 
-        layer = QgsVectorLayer(geojson_path, layer_name, "ogr")
+        # A sub-metre bbox cannot match any feature; build the empty result
+        # locally rather than paying a network round-trip to learn it's
+        # empty (the common "accidental run" path).
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if (max_lon - min_lon) * (max_lat - min_lat) < 1e-10:
+            try:
+                fh = _VsimemFile(geojson_path)
+                try:
+                    fh.write(_EMPTY_FEATURE_COLLECTION)
+                finally:
+                    fh.close()
+            except OSError as exc:
+                self._set_error(str(exc))
+                return
+            self._pending_path = geojson_path
+            self._pending_layer_name = layer_name
+            self._load_pending_layer()
+            return
+
+        # One client per dialog session: its connection pool and response
+        # cache survive across runs, so a prompt re-run of the same query is
+        # a cache hit (entries expire after a short TTL, so edits made on
+        # OSM show up on later re-runs). Recreate only when the endpoint
+        # changes.
+        if self._client is None or self._client.endpoint != endpoint:
+            if self._client is not None:
+                self._client.close()
+            self._client = PostpassClient(endpoint=endpoint)
+
+        # Run the network + file-write step as a QgsTask so QGIS stays
+        # responsive and the query can be cancelled. Layer loading happens
+        # back on the main thread in _on_query_finished.
+        client = self._client
+        self._pending_path = geojson_path
+        self._pending_layer_name = layer_name
+        self._task = PostpassQueryTask(
+            client, sql, geojson_path, self._on_query_finished
+        )
+        self.runButton.setEnabled(False)
+        self.statusLabel.setStyleSheet("color: black")
+        self.statusLabel.setText("Querying Postpass…")
+        QgsApplication.taskManager().addTask(self._task)
+
+    def _on_query_finished(self, result: bool, task: PostpassQueryTask) -> None:
+        """Load the streamed GeoJSON as a layer once the task completes."""
+        self.runButton.setEnabled(True)
+        self._task = None
+
+        if not result:
+            gdal.Unlink(self._pending_path)
+            if task.cancelled:
+                self._set_error("Postpass query cancelled.")
+            else:
+                self._set_error(task.error or "Postpass query failed.")
+            return
+
+        self._load_pending_layer()
+
+    def _load_pending_layer(self) -> None:
+        """Load the pending GeoJSON path as a map layer."""
+        layer_name = self._pending_layer_name
+        layer = QgsVectorLayer(self._pending_path, layer_name, "ogr")
         if not layer.isValid():
+            gdal.Unlink(self._pending_path)
             self._set_error("Loaded layer from Postpass response is not valid.")
             return
 
+        # Free the in-memory file once the layer is dropped from the project.
+        self._vsimem_paths[layer.id()] = self._pending_path
         QgsProject.instance().addMapLayer(layer)
         self._set_success(f"Loaded layer '{layer_name}' from Postpass.")
+
+    def _on_dialog_finished(self, _result: int) -> None:
+        """Release the HTTP client and its response cache on dialog close."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def _on_layer_removed(self, layer_id: str) -> None:
+        """Release the /vsimem/ file backing a removed layer, if any."""
+        path = self._vsimem_paths.pop(layer_id, None)
+        if path is not None:
+            gdal.Unlink(path)
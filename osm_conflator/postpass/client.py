@@ -2,60 +2,423 @@
 
 from __future__ import annotations
 
-import json
-from typing import Any
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Sequence
+from urllib.parse import quote_from_bytes
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+
+try:
+    # Optional: Rust-backed JSON decoding is typically 2-5x faster than the
+    # stdlib on large GeoJSON bodies. Both accept bytes directly.
+    import orjson as _json
+except ImportError:  # pragma: no cover - plain QGIS installs
+    import json as _json
 
 from .query_builder import BBox, build_simple_query
 
 DEFAULT_POSTPASS_ENDPOINT = "https://postpass.geofabrik.de/api/0.2/interpreter"
 
+_FORM_CONTENT_TYPE = "application/x-www-form-urlencoded"
+
+# Maximum number of responses kept in the per-client result cache.
+_CACHE_MAX_ENTRIES = 8
+
+# How long a cached response stays valid. Short enough that an extract ->
+# edit OSM -> re-extract workflow sees fresh data, long enough that quick
+# re-runs (layer-name tweaks, accidental double clicks) stay hits.
+_CACHE_TTL_SECONDS = 120.0
+
+
+@lru_cache(maxsize=32)
+def _encode_body(sql: str) -> bytes:
+    """Percent-encode ``sql`` into a ready-to-send ``data=...`` form body.
+
+    A direct ``quote_from_bytes`` pass avoids urlencode's dict construction
+    and iteration for the single known field; caching means repeated SQL
+    (retries, dialog re-runs) skips the encoding entirely.
+    """
+    return b"data=" + quote_from_bytes(sql.encode("utf-8"), safe=b"").encode("ascii")
+
+
+def _tile_bbox(bbox: BBox, nx: int, ny: int) -> list[BBox]:
+    """Split ``bbox`` into an ``nx`` x ``ny`` grid of sub-bboxes."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    lon_step = (max_lon - min_lon) / nx
+    lat_step = (max_lat - min_lat) / ny
+    return [
+        (
+            min_lon + i * lon_step,
+            min_lat + j * lat_step,
+            min_lon + (i + 1) * lon_step,
+            min_lat + (j + 1) * lat_step,
+        )
+        for i in range(nx)
+        for j in range(ny)
+    ]
+
 
 class PostpassClientError(RuntimeError):
     """Raised when a PostPass request fails or returns invalid data."""
 
 
+class PostpassCancelledError(PostpassClientError):
+    """Raised when a PostPass request is cancelled mid-transfer."""
+
+
 class PostpassClient:
-    """Small HTTP wrapper around a PostPass SQL interpreter endpoint."""
+    """Small HTTP wrapper around a PostPass SQL interpreter endpoint.
+
+    A single ``requests.Session`` is kept for the lifetime of the client so
+    repeated queries (bbox tiles, retries, several extractions in one dialog
+    session) reuse keep-alive HTTPS connections instead of paying a fresh
+    TCP + TLS handshake per request.
+    """
 
     def __init__(self, endpoint: str = DEFAULT_POSTPASS_ENDPOINT, timeout: int = 60):
         """Initialise a PostPass client."""
         self.endpoint = endpoint
         self.timeout = timeout
 
-    def run_sql(self, sql: str) -> dict[str, Any]:
-        """Execute SQL against PostPass and return parsed GeoJSON."""
+        self._session = requests.Session()
+        # GeoJSON compresses extremely well (repeated keys, coordinate
+        # arrays); ask for gzip explicitly so responses stay compressed on
+        # the wire. requests decompresses transparently, including when
+        # streaming via iter_content.
+        self._session.headers["Accept-Encoding"] = "gzip, deflate"
+        # The body is always a pre-encoded form (see _encode_body), so pin
+        # the content type once on the session instead of per request.
+        self._session.headers["Content-Type"] = _FORM_CONTENT_TYPE
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            # urllib3's default allowed_methods excludes POST, which is the
+            # only method this client sends; allow it explicitly or the
+            # status_forcelist never triggers. Safe here because the
+            # interpreter endpoint is a read-only SQL query, so retrying a
+            # POST is idempotent.
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[502, 503, 504],
+                allowed_methods=frozenset({"POST"}),
+            ),
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        # LRU of recent responses, keyed by (endpoint, sql digest) and backed
+        # by tempfiles so cached bodies stay off the Python heap. Re-running
+        # the same query (dialog re-runs, layer-name tweaks) then costs a file
+        # copy instead of a network round-trip. Entries expire after
+        # _CACHE_TTL_SECONDS so repeat queries eventually see fresh data.
+        self._cache: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+
+    def close(self) -> None:
+        """Release the pooled HTTP connections and drop cached responses."""
+        self._session.close()
+        self.clear_cache()
+
+    def clear_cache(self) -> None:
+        """Remove all cached responses and their backing files."""
+        while self._cache:
+            _, (path, _stored_at) = self._cache.popitem()
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _cache_key(self, sql: str) -> tuple[str, str]:
+        digest = hashlib.blake2b(sql.encode("utf-8"), digest_size=16).hexdigest()
+        return (self.endpoint, digest)
+
+    def _cache_get(self, sql: str) -> str | None:
+        """Return the cached response path for ``sql``, refreshing recency.
+
+        Entries past their TTL are dropped (and their backing file removed)
+        so a repeat query re-fetches instead of serving stale data.
+        """
+        key = self._cache_key(sql)
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        path, stored_at = entry
+        if time.monotonic() - stored_at > _CACHE_TTL_SECONDS:
+            del self._cache[key]
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        self._cache.move_to_end(key)
+        return path
+
+    def _cache_evict(self, sql: str) -> None:
+        """Drop the cache entry for ``sql`` whose backing file is unusable."""
+        self._cache.pop(self._cache_key(sql), None)
+
+    def _cache_put(self, sql: str, path: str) -> None:
+        """Store a cache-owned response file, evicting the oldest entry."""
+        self._cache[self._cache_key(sql)] = (path, time.monotonic())
+        while len(self._cache) > _CACHE_MAX_ENTRIES:
+            _, (evicted, _stored_at) = self._cache.popitem(last=False)
+            try:
+                os.unlink(evicted)
+            except OSError:
+                pass
+
+    def __enter__(self) -> "PostpassClient":
+        """Allow ``with PostpassClient(...) as client:`` usage."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Close the session on context exit."""
+        self.close()
+
+    def _post(self, sql: str, stream: bool = False) -> requests.Response:
+        """Validate inputs and POST ``sql`` to the endpoint."""
         if not self.endpoint:
             raise PostpassClientError("PostPass endpoint is required.")
         if not sql or not sql.strip():
             raise PostpassClientError("SQL query is required.")
 
-        body = urlencode({"data": sql}).encode("utf-8")
-        request = Request(self.endpoint, data=body, method="POST")
-
         try:
-            with urlopen(request, timeout=self.timeout) as resp:
-                raw = resp.read()
-        except Exception as exc:  # noqa: BLE001
+            resp = self._session.post(
+                self.endpoint,
+                data=_encode_body(sql),
+                timeout=self.timeout,
+                stream=stream,
+            )
+            resp.raise_for_status()
+        except requests.RequestException as exc:
             raise PostpassClientError(f"HTTP request failed: {exc}") from exc
+        return resp
 
+    def _store_response(self, sql: str, raw: bytes) -> None:
+        """Write ``raw`` to a cache-owned tempfile; caching is best-effort."""
         try:
-            payload = json.loads(raw.decode("utf-8"))
+            tmp = tempfile.NamedTemporaryFile(
+                suffix=".geojson", prefix="osm_conflator_cache_", delete=False
+            )
+            with tmp:
+                tmp.write(raw)
+        except OSError:
+            return
+        self._cache_put(sql, tmp.name)
+
+    def run_sql(self, sql: str, cache: bool = True) -> dict[str, Any]:
+        """Execute SQL against PostPass and return parsed GeoJSON.
+
+        Repeat queries are served from the client's response cache;
+        ``cache=False`` bypasses both lookup and store for callers that need
+        fresh data.
+        """
+        raw = None
+        if cache:
+            cached = self._cache_get(sql)
+            if cached is not None:
+                try:
+                    with open(cached, "rb") as fh:
+                        raw = fh.read()
+                except OSError:
+                    # Backing file vanished (e.g. tmp cleaner); refetch.
+                    self._cache_evict(sql)
+
+        fetched = raw is None
+        if fetched:
+            raw = self._post(sql).content
+
+        try:
+            payload = _json.loads(raw)
         except Exception as exc:  # noqa: BLE001
             raise PostpassClientError("PostPass response was not valid JSON.") from exc
 
         if not isinstance(payload, dict):
             raise PostpassClientError("PostPass response must be a GeoJSON object.")
+
+        if cache and fetched:
+            self._store_response(sql, raw)
         return payload
 
-    def extract_buildings(self, bbox: BBox) -> dict[str, Any]:
-        """Extract OSM buildings in a bbox from the PostPass point/polygon view."""
+    def run_sql_to_fileobj(
+        self,
+        sql: str,
+        fh: Any,
+        cancel_check: Callable[[], bool] | None = None,
+        cache: bool = True,
+    ) -> None:
+        """Execute SQL against PostPass, streaming chunks to an open file object.
+
+        ``fh`` only needs a ``write(bytes)`` method, so callers can hand in a
+        regular file, or e.g. a GDAL ``/vsimem/`` wrapper, without the body
+        ever being materialised in Python — one pass over the bytes, constant
+        memory. Cache hits are replayed from the cached file; on misses the
+        chunks are teed into a cache tempfile as they stream, so caching adds
+        no extra memory.
+
+        ``cancel_check`` is polled between chunks; returning True aborts the
+        download with :class:`PostpassCancelledError` (used by background
+        tasks to stop promptly).
+        """
+        if cache:
+            cached = self._cache_get(sql)
+            if cached is not None:
+                try:
+                    src = open(cached, "rb")
+                except OSError:
+                    # Backing file vanished (e.g. tmp cleaner); fall through
+                    # to a fresh fetch.
+                    self._cache_evict(sql)
+                else:
+                    try:
+                        with src:
+                            while chunk := src.read(64 * 1024):
+                                fh.write(chunk)
+                    except OSError as exc:
+                        raise PostpassClientError(
+                            f"Failed to write response data: {exc}"
+                        ) from exc
+                    return
+
+        # Open the cache tempfile only after the request has succeeded; a
+        # failed _post would otherwise orphan a file no cleanup path owns.
+        resp = self._post(sql, stream=True)
+        cache_fh = None
+        if cache:
+            try:
+                cache_fh = tempfile.NamedTemporaryFile(
+                    suffix=".geojson", prefix="osm_conflator_cache_", delete=False
+                )
+            except OSError:
+                cache_fh = None
+
+        complete = False
+        try:
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                if cancel_check is not None and cancel_check():
+                    raise PostpassCancelledError("PostPass request cancelled.")
+                fh.write(chunk)
+                if cache_fh is not None:
+                    cache_fh.write(chunk)
+            complete = True
+        except OSError as exc:
+            raise PostpassClientError(f"Failed to write response data: {exc}") from exc
+        finally:
+            resp.close()
+            if cache_fh is not None:
+                cache_fh.close()
+                if complete:
+                    self._cache_put(sql, cache_fh.name)
+                else:
+                    try:
+                        os.unlink(cache_fh.name)
+                    except OSError:
+                        pass
+
+    def run_sql_to_file(
+        self,
+        sql: str,
+        path: str,
+        cancel_check: Callable[[], bool] | None = None,
+        cache: bool = True,
+    ) -> None:
+        """Execute SQL against PostPass, streaming the raw response to ``path``.
+
+        PostPass responds with GeoJSON that downstream consumers (OGR) parse
+        from the file anyway, so parsing the body in Python would be wasted
+        work. See :meth:`run_sql_to_fileobj` for ``cancel_check`` and
+        ``cache``.
+        """
+        try:
+            with open(path, "wb") as fh:
+                self.run_sql_to_fileobj(sql, fh, cancel_check=cancel_check, cache=cache)
+        except OSError as exc:
+            raise PostpassClientError(f"Failed to write response file: {exc}") from exc
+
+    def run_sql_tiled(
+        self,
+        *,
+        table: str,
+        bbox: BBox,
+        columns: Sequence[str] | None = None,
+        tag_key: str | None = None,
+        tag_values: Sequence[str] | None = None,
+        use_centroid: bool = False,
+        tiles: tuple[int, int] = (2, 2),
+        max_workers: int = 4,
+    ) -> dict[str, Any]:
+        """Query a large bbox as a grid of concurrent sub-bbox requests.
+
+        The bbox is split into ``tiles`` (columns x rows) sub-bboxes whose
+        queries run concurrently on a thread pool over the shared keep-alive
+        session, then the GeoJSON results are merged into one
+        FeatureCollection. Features straddling tile boundaries are returned
+        by multiple tiles, so duplicates are dropped by ``osm_id``.
+
+        For large extractions this trades one huge response for several
+        smaller ones fetched in parallel, bounded by the endpoint's
+        concurrency policy and ``max_workers``.
+        """
+        nx, ny = tiles
+        if nx < 1 or ny < 1:
+            raise ValueError("tiles must be at least (1, 1).")
+
+        sqls = [
+            build_simple_query(
+                table=table,
+                bbox=sub_bbox,
+                columns=columns,
+                tag_key=tag_key,
+                tag_values=tag_values,
+                use_centroid=use_centroid,
+            )
+            for sub_bbox in _tile_bbox(bbox, nx, ny)
+        ]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(sqls))) as pool:
+            results = list(pool.map(self.run_sql, sqls))
+
+        features: list[dict[str, Any]] = []
+        seen_ids: set = set()
+        for result in results:
+            for feature in result.get("features", []):
+                osm_id = (feature.get("properties") or {}).get("osm_id")
+                if osm_id is not None:
+                    if osm_id in seen_ids:
+                        continue
+                    seen_ids.add(osm_id)
+                features.append(feature)
+        return {"type": "FeatureCollection", "features": features}
+
+    def extract_buildings(
+        self,
+        bbox: BBox,
+        tag_values: Sequence[str] = ("yes",),
+        use_centroid: bool = True,
+    ) -> dict[str, Any]:
+        """Extract OSM buildings in a bbox from the PostPass point/polygon view.
+
+        ``tag_values`` selects which ``building=...`` values to match, e.g.
+        ``("yes", "house", "apartments")``; multiple values are fetched in a
+        single query via the builder's ``IN (...)`` branch.
+
+        ``use_centroid`` defaults to True: conflation candidate matching only
+        needs representative points, and building polygons are the worst-case
+        payload — centroids cut the response size 10-100x. Pass False for
+        full geometries.
+        """
         sql = build_simple_query(
             table="postpass_pointpolygon",
             bbox=bbox,
             columns=[],
             tag_key="building",
-            tag_values=["yes"],
+            tag_values=tag_values,
+            use_centroid=use_centroid,
         )
         return self.run_sql(sql)
@@ -14,10 +14,60 @@ exposes a PostGIS-enabled PostgreSQL database over HTTP:
 https://github.com/woodpeck/postpass
 """
 
+from functools import lru_cache
 from typing import Optional, Sequence, Tuple
 
 BBox = Tuple[float, float, float, float]
 
+# Pre-built template for the bbox clause; only the four floats vary per call,
+# so a single str.format beats re-composing nested f-strings each time.
+_BBOX_TEMPLATE = (
+    "{geom_col} && ST_MakeEnvelope({min_lon}, {min_lat}, {max_lon}, {max_lat}, 4326)"
+)
+
+
+def _quote_literal(value: str) -> str:
+    """Return ``value`` as a safely quoted SQL string literal.
+
+    Postpass's HTTP interface accepts only a raw SQL string (no bound
+    parameters), so user-supplied keys and values are escaped locally:
+    single quotes are doubled and NUL bytes rejected. Besides closing the
+    injection hole, one canonical quoting routine keeps equivalent inputs
+    producing identical SQL, which helps server-side plan caching.
+    """
+    if "\x00" in value:
+        raise ValueError("SQL literal must not contain NUL bytes.")
+    escaped = value.replace("'", "''")
+    return f"'{escaped}'"
+
+
+def _quote_ident(name: str) -> str:
+    """Return ``name`` as a safely double-quoted SQL identifier."""
+    if "\x00" in name:
+        raise ValueError("SQL identifier must not contain NUL bytes.")
+    escaped = name.replace('"', '""')
+    return f'"{escaped}"'
+
+
+def _normalize_columns(columns: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    """Strip column names and drop blanks and wildcards, once at the boundary.
+
+    ``*`` is treated as "just keep tags", which the select list includes
+    anyway. Normalizing here means the cached workers see canonical tuples,
+    so ``"amenity"`` and ``" amenity "`` share one cache entry.
+    """
+    return tuple(
+        c for c in ((col or "").strip() for col in columns or ()) if c and c != "*"
+    )
+
+
+def _normalize_tag_values(values: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    """Strip tag values and drop blanks; a lone ``*`` means "presence only"."""
+    cleaned = tuple(v for v in ((val or "").strip() for val in values or ()) if v)
+    if cleaned == ("*",):
+        return ()
+    return cleaned
+
 
 def create_column_filter(
     columns: Sequence[str],
@@ -34,14 +84,16 @@ def create_column_filter(
     * Always returns a geometry column named ``geom`` (either centroid or
       the original geometry).
     """
+    return _build_select(_normalize_columns(columns), use_centroid)
+
+
+@lru_cache(maxsize=256)
+def _build_select(columns: Tuple[str, ...], use_centroid: bool) -> str:
+    """Cached worker for :func:`create_column_filter`; expects normalized input."""
     select_cols = ["osm_id", "tags"]
 
     for col in columns:
-        col = col.strip()
-        if not col or col == "*":
-            # ``*`` is treated as "just keep tags" which we already do.
-            continue
-        select_cols.append(f"tags->>'{col}' as \"{col}\"")
+        select_cols.append(f"tags->>{_quote_literal(col)} as {_quote_ident(col)}")
 
     geom_expr = "ST_Centroid(geom) as geom" if use_centroid else "geom"
     select_cols.append(geom_expr)
@@ -50,24 +102,24 @@ def create_column_filter(
 
 
 def create_bbox_filter(bbox: BBox, geom_col: str = "geom") -> str:
-    """Return a PostGIS bbox filter using ST_MakeBox2D/SetSRID.
+    """Return a PostGIS bbox filter using ST_MakeEnvelope.
 
-    Matches the style used in the Postpass examples, e.g.:
+    Emits the PostGIS-recommended index-friendly form:
 
-        geom && ST_SetSRID(
-            ST_MakeBox2D(ST_MakePoint(min_lon, min_lat),
-                         ST_MakePoint(max_lon, max_lat)),
-            4326
-        )
+        geom && ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+
+    ``ST_MakeEnvelope`` over literals folds to a constant geometry, unlike
+    the nested ``ST_SetSRID(ST_MakeBox2D(...))`` form which some older
+    planners re-evaluate per row; the ``&&`` overlap keeps the GiST index
+    scan sargable.
     """
     min_lon, min_lat, max_lon, max_lat = bbox
-    return (
-        f"{geom_col} && "
-        "ST_SetSRID("
-        "ST_MakeBox2D("
-        f"ST_MakePoint({min_lon}, {min_lat}),"
-        f"ST_MakePoint({max_lon}, {max_lat})"
-        "), 4326)"
+    return _BBOX_TEMPLATE.format(
+        geom_col=geom_col,
+        min_lon=min_lon,
+        min_lat=min_lat,
+        max_lon=max_lon,
+        max_lat=max_lat,
     )
 
 
@@ -82,18 +134,33 @@ def create_tag_filter(key: str, values: Sequence[str]) -> str:
     * single value of ``"*"``
       (wildcard) is treated as "presence only", like raw-data-api.
     """
-    cleaned = [v for v in (values or []) if v is not None and v != ""]
-    if len(cleaned) == 1 and cleaned[0] == "*":
-        cleaned = []
+    return _build_tag_clause(key.strip(), _normalize_tag_values(values))
+
+
+@lru_cache(maxsize=256)
+def _build_tag_clause(key: str, values: Tuple[str, ...]) -> str:
+    """Cached worker for :func:`create_tag_filter`; expects normalized input."""
+    if not values:
+        return f"tags ? {_quote_literal(key)}"
 
-    if not cleaned:
-        return f"tags ? '{key.strip()}'"
+    if len(values) == 1:
+        return f"tags->>{_quote_literal(key)} = {_quote_literal(values[0])}"
 
-    if len(cleaned) == 1:
-        return f"tags->>'{key.strip()}' = '{cleaned[0].strip()}'"
+    in_list = ", ".join(_quote_literal(v) for v in values)
+    return f"tags->>{_quote_literal(key)} IN ({in_list})"
 
-    in_list = ", ".join(f"'{v.strip()}'" for v in cleaned)
-    return f"tags->>'{key.strip()}' IN ({in_list})"
+
+# Full statement templates for the default column set, enumerated over the
+# (has_tag_filter, use_centroid) shape space at import time. Only the table,
+# bbox clause and (optionally) tag clause get substituted per call.
+_DEFAULT_QUERY_TEMPLATES = {
+    (has_tag, use_centroid): (
+        f"SELECT {_build_select((), use_centroid)} FROM {{table}} WHERE {{bbox}}"
+        + (" AND {tag}" if has_tag else "")
+    )
+    for has_tag in (False, True)
+    for use_centroid in (False, True)
+}
 
 
 def build_simple_query(
@@ -126,11 +193,29 @@ def build_simple_query(
     if not table:
         raise ValueError("table is required for Postpass query.")
 
-    select_sql = create_column_filter(columns or [], use_centroid=use_centroid)
+    # Normalize once at the boundary: the cached workers then key on
+    # canonical tuples, so equivalent inputs share cache entries.
+    columns = _normalize_columns(columns)
+    tag_key = (tag_key or "").strip() or None
+    tag_values = _normalize_tag_values(tag_values)
+
+    # Fast path for the dialog's defaults (no extra columns): the whole
+    # statement shape is known at import time, so one format call suffices.
+    if not columns:
+        template = _DEFAULT_QUERY_TEMPLATES[(bool(tag_key), use_centroid)]
+        bbox_sql = create_bbox_filter(bbox)
+        if tag_key:
+            tag_sql = _build_tag_clause(tag_key, tag_values)
+            return template.format(table=table, bbox=bbox_sql, tag=tag_sql)
+        return template.format(table=table, bbox=bbox_sql)
+
+    # Tuples are hashable, so the select/tag clauses hit the lru_cache on
+    # repeated builds; only the bbox clause varies per call when tiling.
+    select_sql = _build_select(columns, use_centroid)
     where_clauses = [create_bbox_filter(bbox)]
 
     if tag_key:
-        where_clauses.append(create_tag_filter(tag_key, tag_values or []))
+        where_clauses.append(_build_tag_clause(tag_key, tag_values))
 
     where_sql = " AND ".join(where_clauses)
     return f"SELECT {select_sql} FROM {table} WHERE {where_sql}"